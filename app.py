@@ -1,17 +1,20 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import json
-from gtts import gTTS
 import base64
 from io import BytesIO
-from deep_translator import GoogleTranslator
-import eng_to_ipa
 import time
 import re
 import uuid
 import random
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+# gspread / oauth2client / gTTS / deep_translator / eng_to_ipa 較重，改為第一次用到時才 import
 
 # ==========================================
 # 1. 頁面設定
@@ -22,7 +25,7 @@ st.set_page_config(page_title=f"AI 智能單字速記通 ({VERSION})", layout="w
 # ==========================================
 # 2. CSS 樣式
 # ==========================================
-st.markdown("""
+APP_CSS = """
 <style>
     .main { font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; }
     
@@ -101,21 +104,237 @@ st.markdown("""
     .login-title { color: #2E7D32; margin-top: 0; font-size: 48px; font-weight: 900; }
     .version-tag { position: fixed; bottom: 10px; left: 15px; color: #aaa; font-size: 14px; font-family: monospace; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Streamlit 每次 rerun 都必須重新送出 CSS，先壓縮空白以減少傳輸量
+APP_CSS_MIN = re.sub(r"\s+", " ", APP_CSS).strip()
+st.markdown(APP_CSS_MIN, unsafe_allow_html=True)
+
+# ==========================================
+# 3. 效能監測 (計時器 / 計數器 / Prometheus 匯出)
+# ==========================================
+# 匯出設定：PERF_METRICS_FILE=檔案路徑 (每次 rerun 結束寫入)，PERF_METRICS_PORT=本機埠號 (提供 /metrics)
+PERF_METRICS_FILE = os.environ.get("PERF_METRICS_FILE", "")
+PERF_METRICS_PORT = int(os.environ.get("PERF_METRICS_PORT", "0") or 0)
+
+class PerfRegistry:
+    """整個 process 共用的統計：timers 為 name -> [次數, 總秒數, 最大秒數]，counters 為 name -> 次數"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+
+    def observe(self, name, seconds):
+        with self.lock:
+            t = self.timers.setdefault(name, [0, 0.0, 0.0])
+            t[0] += 1; t[1] += seconds; t[2] = max(t[2], seconds)
+
+    def inc(self, name, n=1):
+        with self.lock: self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self.lock: return {k: list(v) for k, v in self.timers.items()}, dict(self.counters)
+
+    def cache_stats(self):
+        """快取命中率：呼叫次數取自計時器，未命中次數取自函式內部的 <name>_cache_miss 計數"""
+        timers, counters = self.snapshot()
+        stats = {}
+        for name, (calls, _, _) in timers.items():
+            if f"{name}_cache_miss" not in counters: continue
+            misses = counters[f"{name}_cache_miss"]
+            stats[name] = (calls, max(calls - misses, 0), misses)
+        return stats
+
+    def to_prometheus(self):
+        timers, counters = self.snapshot()
+        lines = ["# HELP vocab_app_duration_seconds Time spent in instrumented operations.",
+                 "# TYPE vocab_app_duration_seconds summary"]
+        for name, (count, total, _) in sorted(timers.items()):
+            lines.append(f'vocab_app_duration_seconds_count{{op="{name}"}} {count}')
+            lines.append(f'vocab_app_duration_seconds_sum{{op="{name}"}} {total:.6f}')
+        lines += ["# HELP vocab_app_duration_max_seconds Slowest observed call per operation.",
+                  "# TYPE vocab_app_duration_max_seconds gauge"]
+        for name, (_, _, worst) in sorted(timers.items()):
+            lines.append(f'vocab_app_duration_max_seconds{{op="{name}"}} {worst:.6f}')
+        lines += ["# HELP vocab_app_events_total Instrumented event counters.",
+                  "# TYPE vocab_app_events_total counter"]
+        for name, n in sorted(counters.items()):
+            lines.append(f'vocab_app_events_total{{event="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource(show_spinner=False)
+def get_perf_registry():
+    return PerfRegistry()
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(port):
+    """在背景執行緒提供 http://127.0.0.1:<port>/metrics (每個 process 只啟動一次)"""
+    registry = get_perf_registry()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404); self.end_headers(); return
+            body = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers(); self.wfile.write(body)
+
+        def log_message(self, *args): pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_metrics_file(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f: f.write(get_perf_registry().to_prometheus())
+    os.replace(tmp_path, path)
+
+def perf_count(name, n=1):
+    get_perf_registry().inc(name, n)
+
+@contextmanager
+def perf_timer(name):
+    """計時一段程式：累計到全域統計，並記錄在本次 rerun 的明細 (st.session_state.perf_rerun)"""
+    start = time.perf_counter()
+    try: yield
+    finally:
+        elapsed = time.perf_counter() - start
+        get_perf_registry().observe(name, elapsed)
+        # 背景執行緒 (例如預先載入資料) 沒有 session，只計入全域統計
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            st.session_state.setdefault('perf_rerun', []).append((name, elapsed))
+
+def profiled(name):
+    """函式計時 decorator；包在 st.cache_data 外層時保留 .clear()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with perf_timer(name): return func(*args, **kwargs)
+        if hasattr(func, "clear"): wrapper.clear = func.clear
+        return wrapper
+    return decorator
+
+def perf_start(name):
+    """不需縮排的計時：記下開始時間，由 perf_close_marks() 結束 (st.rerun() 中斷時由 perf_end_rerun() 收尾)"""
+    st.session_state.setdefault('perf_marks', []).append((name, time.perf_counter()))
+
+def perf_close_marks():
+    now = time.perf_counter()
+    for name, start in st.session_state.get('perf_marks', []):
+        get_perf_registry().observe(name, now - start)
+        st.session_state.setdefault('perf_rerun', []).append((name, now - start))
+    st.session_state.perf_marks = []
+
+def is_perf_admin(user):
+    """效能面板只給管理者：PERF_ADMINS 環境變數 (逗號分隔) 或 secrets 的 perf_admins 清單"""
+    admins = [u.strip() for u in os.environ.get("PERF_ADMINS", "").split(",") if u.strip()]
+    try: admins += [str(u).strip() for u in st.secrets.get("perf_admins", [])]
+    except: pass
+    return str(user).strip() in admins
+
+def perf_begin_rerun():
+    # perf_rerun 不在這裡清空：on_click callback 在腳本本體之前執行，它們的計時要算在這次 rerun
+    perf_count("reruns")
+    if PERF_METRICS_PORT:
+        try: start_metrics_server(PERF_METRICS_PORT)
+        except OSError: pass
+
+def perf_end_rerun(interrupted=False):
+    """結束本次 rerun 的明細；被 st.rerun() 中斷的 (寫入路徑大多如此) 另外保留，面板才看得到它們的耗時"""
+    perf_close_marks()
+    st.session_state.perf_last_rerun = st.session_state.get('perf_rerun', [])
+    if interrupted: st.session_state.perf_last_interrupted = st.session_state.perf_last_rerun
+    st.session_state.perf_rerun = []
+    if PERF_METRICS_FILE:
+        try: write_metrics_file(PERF_METRICS_FILE)
+        except OSError: pass
+
+def render_rerun_breakdown(title, records):
+    rows = {}
+    for name, elapsed in records:
+        r = rows.setdefault(name, {'項目': name, '次數': 0, '耗時 (ms)': 0.0})
+        r['次數'] += 1; r['耗時 (ms)'] += elapsed * 1000
+    st.write(title)
+    if rows:
+        st.dataframe(pd.DataFrame(rows.values()).sort_values('耗時 (ms)', ascending=False).round(1), hide_index=True, use_container_width=True)
+    else: st.caption("(尚無紀錄)")
+
+def render_perf_panel():
+    """管理者面板：本次 / 上一次 / 最近被 st.rerun() 中斷的 rerun 耗時明細 + 快取命中率 + Prometheus 文字"""
+    registry = get_perf_registry()
+    with st.expander("📊 效能監測面板", expanded=True):
+        render_rerun_breakdown("⏱️ **本次 rerun 耗時明細**", st.session_state.get('perf_rerun', []))
+        last = st.session_state.get('perf_last_rerun', [])
+        interrupted = st.session_state.get('perf_last_interrupted', [])
+        render_rerun_breakdown("⏮️ **上一次 rerun 耗時明細**", last)
+        if interrupted and interrupted is not last:
+            render_rerun_breakdown("🔁 **最近一次被 st.rerun() 中斷的 rerun (新增 / 刪除 / 修改等寫入動作)**", interrupted)
+
+        st.write("🎯 **快取命中率 (process 累計)**")
+        cache_rows = [{'函式': name, '呼叫': calls, '命中': hits, '未命中': misses, '命中率': f"{hits / calls * 100:.1f}%" if calls else "-"}
+                      for name, (calls, hits, misses) in registry.cache_stats().items()]
+        if cache_rows: st.dataframe(pd.DataFrame(cache_rows), hide_index=True, use_container_width=True)
+        else: st.caption("(尚無紀錄)")
+
+        timers, _ = registry.snapshot()
+        if timers:
+            st.write("📈 **累計統計 (process 累計)**")
+            total_rows = [{'項目': name, '次數': count, '平均 (ms)': round(total / count * 1000, 1), '最大 (ms)': round(worst * 1000, 1)}
+                          for name, (count, total, worst) in sorted(timers.items())]
+            st.dataframe(pd.DataFrame(total_rows), hide_index=True, use_container_width=True)
+        st.download_button("📥 下載 Prometheus 指標", registry.to_prometheus(), "metrics.prom", "text/plain", use_container_width=True)
 
 # ==========================================
 # 2. 核心功能
 # ==========================================
+SHEET_SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
 
+class SheetPool:
+    """process 共用的已授權 gspread 連線：憑證只解析一次，vocab_db 只開啟一次，token 過期時重新授權"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.creds = None
+        self.sheet = None
+
+    def get(self, force_refresh=False):
+        with self.lock:
+            expired = getattr(self.creds, 'access_token_expired', False)
+            if force_refresh or self.sheet is None or expired:
+                import gspread
+                if self.creds is None:
+                    from oauth2client.service_account import ServiceAccountCredentials
+                    creds_json = json.loads(st.secrets["service_account"]["info"])
+                    self.creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, SHEET_SCOPE)
+                self.sheet = gspread.authorize(self.creds).open("vocab_db").sheet1
+                perf_count("sheet_authorize")
+            return self.sheet
+
+    def run(self, action):
+        """對工作表執行 action(sheet)；遇到 401 (token 失效) 時重新授權並重試一次"""
+        from gspread.exceptions import APIError
+        try: return action(self.get())
+        except APIError as e:
+            if e.code != 401: raise
+            return action(self.get(force_refresh=True))
+
+@st.cache_resource(show_spinner=False)
+def get_sheet_pool():
+    return SheetPool()
+
+@st.cache_resource(show_spinner=False)
+def get_loader_pool():
+    """背景載入資料用的執行緒 (登入頁先畫出來，資料在背景讀取)"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="vocab_loader")
+
+@profiled("get_google_sheet_data")
 @st.cache_data(ttl=60, show_spinner=False)
 def get_google_sheet_data():
+    perf_count("get_google_sheet_data_cache_miss")
     try:
-        creds_json = json.loads(st.secrets["service_account"]["info"])
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open("vocab_db").sheet1
-        data = sheet.get_all_records()
+        data = get_sheet_pool().run(lambda sheet: sheet.get_all_records())
         cols = ['User', 'Password', 'Notebook', 'Word', 'IPA', 'Chinese', 'Date']
         if not data: return pd.DataFrame(columns=cols)
         df = pd.DataFrame(data)
@@ -127,14 +346,9 @@ def get_google_sheet_data():
         return df.fillna("")
     except: return pd.DataFrame(columns=['User', 'Password', 'Notebook', 'Word', 'IPA', 'Chinese', 'Date'])
 
+@profiled("save_to_google_sheet")
 def save_to_google_sheet(df):
     try:
-        creds_json = json.loads(st.secrets["service_account"]["info"])
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_json, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open("vocab_db").sheet1
-        sheet.clear()
         if 'User' in df.columns: df['User'] = df['User'].astype(str).str.strip()
         if 'Password' in df.columns: df['Password'] = df['Password'].astype(str).str.strip()
         cols = ['User', 'Password', 'Notebook', 'Word', 'IPA', 'Chinese', 'Date']
@@ -142,11 +356,20 @@ def save_to_google_sheet(df):
             if c not in df.columns: df[c] = ""
         df = df[cols].fillna("")
         update_data = [df.columns.values.tolist()] + df.values.tolist()
-        sheet.update(update_data)
+        def write(sheet):
+            sheet.clear(); sheet.update(update_data)
+        get_sheet_pool().run(write)
         get_google_sheet_data.clear()
     except Exception as e: st.error(f"儲存失敗：{e}")
 
+def update_df(df):
+    """UI 修改資料的共用入口：換掉 session 的 df 並存檔；data_version 跟著 session 的 df 走，搜尋索引依此判斷是否重建"""
+    st.session_state.df = df
+    st.session_state.data_version = st.session_state.get('data_version', 0) + 1
+    save_to_google_sheet(df)
+
 # --- 嚴格重複檢查 (轉小寫 + 去空白) ---
+@profiled("check_duplicate")
 def check_duplicate(df, user, notebook, word):
     if df.empty: return False
     # 統一轉字串、去空白、轉小寫
@@ -163,26 +386,41 @@ def check_duplicate(df, user, notebook, word):
     mask = (
         (temp_df['norm_user'] == user_str) & 
         (temp_df['norm_nb'] == nb_str) & 
-        (temp_df['norm_word'] == word_str)
+        (temp_df['norm_word'] == word_str) &
+        (temp_df['IPA'] != HIDDEN_MARK)  # 共享本的隱藏標記不算已存在
     )
     return not temp_df[mask].empty
 
+@profiled("to_excel")
 def to_excel(df):
     output = BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         df.to_excel(writer, index=False, sheet_name='Sheet1')
     return output.getvalue()
 
+@profiled("translate")
+def translate_to_zh(text):
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator(source='auto', target='zh-TW').translate(text)
+
+@profiled("ipa_convert")
+def to_ipa(word):
+    import eng_to_ipa
+    return f"[{eng_to_ipa.convert(word)}]"
+
 def is_contains_chinese(string):
     for char in str(string):
         if '\u4e00' <= char <= '\u9fff': return True
     return False
 
 # --- 語音核心 (v32 邏輯 + Cache) ---
+@profiled("get_audio_base64")
 @st.cache_data(show_spinner=False)
 def get_audio_base64(text, lang='en', tld='com', slow=False):
+    perf_count("get_audio_base64_cache_miss")
     try:
         if not text: return None
+        from gtts import gTTS
         tts = gTTS(text=str(text), lang=lang, tld=tld, slow=slow)
         fp = BytesIO()
         tts.write_to_fp(fp)
@@ -201,6 +439,7 @@ def get_audio_html(text, lang='en', tld='com', slow=False, autoplay=False, visib
     </audio>
     """
 
+@profiled("generate_custom_audio")
 def generate_custom_audio(df, sequence, tld='com', slow=False):
     full_text = ""
     for i, (index, row) in enumerate(df.iloc[::-1].iterrows(), start=1):
@@ -212,11 +451,260 @@ def generate_custom_audio(df, sequence, tld='com', slow=False):
                 if item == "英文": full_text += f"{word}. "
                 elif item == "中文": full_text += f"{chinese}. "
         full_text += " ... "
+    from gtts import gTTS
     tts = gTTS(text=full_text, lang='zh-TW', slow=slow)
     fp = BytesIO()
     tts.write_to_fp(fp)
     return fp.getvalue()
 
+# --- 搜尋索引 (前綴 Trie + 雙字元 n-gram + 編輯距離) ---
+def edit_distance(a, b, max_dist=None):
+    """Optimal string alignment (Damerau) 距離：相鄰字母對調 (form/from) 算 1 次；給 max_dist 時超過就提早結束並回傳 max_dist + 1"""
+    if a == b: return 0
+    if max_dist is not None and abs(len(a) - len(b)) > max_dist: return max_dist + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i]
+        for j, cb in enumerate(b, start=1):
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb: d = min(d, prev2[j - 2] + 1)
+            cur.append(d)
+        # 對調會回頭用到前兩列，兩列都超過才能確定結果超過
+        if max_dist is not None and min(cur) > max_dist and min(prev) > max_dist: return max_dist + 1
+        prev2, prev = prev, cur
+    return prev[-1] if max_dist is None else min(prev[-1], max_dist + 1)
+
+def fuzzy_tolerance(word):
+    """搜尋時可容許的拼錯字母數：短字不容錯，長字最多 2 個"""
+    n = len(word)
+    return 0 if n <= 3 else 1 if n <= 7 else 2
+
+def spelling_tolerance(word):
+    """拼字測驗的容錯：6 個字母以下一律要全對 (bear/beer 這類短字差 1 個字母就是另一個字)"""
+    n = len(word)
+    return 0 if n < 6 else 1 if n <= 9 else 2
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+class SearchIndex:
+    """單一使用者可見單字 (resolve_user_view 的結果) 的記憶體索引，key 為 st.session_state.df 的 index"""
+    def __init__(self, user, version):
+        self.user = user
+        self.version = version
+        self.fields = {}   # key -> (word, ipa, chinese) 小寫
+        self.rows = {}     # key -> 顯示用的原始欄位
+        self.trie = [{}, set()]
+        self.grams = {}    # 雙字元 (中文另加單字) -> keys
+        self.shapes = {}   # (英文字首, 字長) -> keys，拼字相近時只比對長度差在容錯內的字
+
+    @classmethod
+    @profiled("search_index_build")
+    def build(cls, df, user, version):
+        index = cls(user, version)
+        for key, row in df.iterrows(): index.add(key, row)
+        return index
+
+    def covers(self, row):
+        return str(row['User']).strip() in (self.user, "", "nan")
+
+    def add(self, key, row):
+        if key in self.fields: self.remove(key)
+        word = str(row['Word']).strip().lower()
+        ipa = str(row['IPA']).strip().strip("[]").lower()
+        chinese = str(row['Chinese']).strip()
+        self.fields[key] = (word, ipa, chinese)
+        self.rows[key] = {'Word': row['Word'], 'IPA': row['IPA'], 'Chinese': row['Chinese'], 'Notebook': row['Notebook']}
+        for token in self._tokens(key):
+            node = self.trie
+            for ch in token:
+                node = node[0].setdefault(ch, [{}, set()])
+                node[1].add(key)
+        for g in self._grams(key): self.grams.setdefault(g, set()).add(key)
+        if word: self.shapes.setdefault((word[0], len(word)), set()).add(key)
+
+    def remove(self, key):
+        if key not in self.fields: return
+        for token in self._tokens(key):
+            node = self.trie
+            for ch in token:
+                node = node[0].get(ch)
+                if node is None: break
+                node[1].discard(key)
+        for g in self._grams(key):
+            ids = self.grams.get(g)
+            if ids is not None: ids.discard(key)
+        word = self.fields[key][0]
+        if word: self.shapes.get((word[0], len(word)), set()).discard(key)
+        del self.fields[key]; del self.rows[key]
+
+    def _tokens(self, key):
+        word, ipa, chinese = self.fields[key]
+        return {t for t in [word, ipa] + re.split(r'[；;，,、/\s]+', chinese) if t}
+
+    def _grams(self, key):
+        # 中文常只打一個字 (蕉 -> 香蕉)，所以中文字也各自索引
+        chinese = self.fields[key][2]
+        return set().union(*(bigrams(f) for f in self.fields[key])) | {ch for ch in chinese if not ch.isascii() and not ch.isspace()}
+
+    def _prefix(self, q):
+        node = self.trie
+        for ch in q:
+            node = node[0].get(ch)
+            if node is None: return set()
+        return node[1]
+
+    @profiled("search")
+    def search(self, query, limit=20):
+        """回傳 [(key, 列資料, 比對方式, 編輯距離)]：前綴 > 包含 > 拼字相近"""
+        q = str(query).strip().lower()
+        if not q: return []
+        found = {key: ("前綴", 0) for key in self._prefix(q)}
+        grams = bigrams(q) if len(q) > 1 else {q}
+        candidates = set().union(*(self.grams.get(g, set()) for g in grams)) - found.keys() if grams else set()
+        for key in candidates:
+            if any(q in f for f in self.fields[key]): found[key] = ("包含", 0)
+        max_d = fuzzy_tolerance(q)
+        if max_d:
+            # 短字對調 (form/from) 可能沒有共同的雙字元，另外比對同字首、長度差在容錯內的英文字
+            shaped = set().union(*(self.shapes.get((q[0], n), set()) for n in range(len(q) - max_d, len(q) + max_d + 1)))
+            for key in (candidates | shaped) - found.keys():
+                word = self.fields[key][0]
+                if abs(len(word) - len(q)) > max_d: continue
+                d = edit_distance(q, word, max_d)
+                if d <= max_d: found[key] = ("相近", d)
+        rank = {"前綴": 0, "包含": 1, "相近": 2}
+        ordered = sorted(found.items(), key=lambda kv: (rank[kv[1][0]], kv[1][1], self.fields[kv[0]][0]))
+        return [(key, self.rows[key], how, d) for key, (how, d) in ordered[:limit]]
+
+def get_search_index(df, user):
+    """每個資料版本只建一次；加入單字時由 append_rows() 增量更新"""
+    version = st.session_state.get('data_version', 0)
+    index = st.session_state.get('search_index')
+    if index is None or index.user != user or index.version != version:
+        index = SearchIndex.build(df, user, version)
+        st.session_state.search_index = index
+    return index
+
+def append_rows(df, new_entries):
+    """把新單字接到 df 後面並存檔；搜尋索引只補新列，不整個重建"""
+    df_new = pd.concat([df, pd.DataFrame(new_entries)], ignore_index=True)
+    index = st.session_state.get('search_index')
+    # ignore_index 會把舊列重新編號，只有原本就是 0..n-1 時舊的 key 才仍然有效；
+    # 加進共享本的字會蓋掉共享列，也交給重建處理
+    up_to_date = (index is not None and index.version == st.session_state.get('data_version', 0)
+                  and df.index.equals(pd.RangeIndex(len(df)))
+                  and not any(str(e['Notebook']).startswith(SHARED_NB_PREFIX) for e in new_entries))
+    update_df(df_new)
+    if up_to_date:
+        for key, row in df_new.iloc[len(df):].iterrows():
+            if index.covers(row): index.add(key, row)
+        index.version = st.session_state.data_version
+    return df_new
+
+# --- 班級共享筆記本 (只存一份，學生修改時 copy-on-write) ---
+# 試算表欄位固定，所以用特殊值標記：
+#   共享本單字：User = "@class:<班級>"，Notebook = "📚 <班級> · <原筆記本>"，整班只存一份
+#   班級成員：  User = 學生，Notebook = "@class"，Word = 班級名稱
+#   班級管理者：User = "@class:<班級>"，Notebook = "@owner"，Word = 第一位派發的老師；只有管理者能派發 / 取代共享本
+#   學生覆寫：  User = 學生，Notebook/Word 與共享列相同 -> 取代共享列；IPA = "@hidden" 代表學生刪除了這個字
+CLASS_PREFIX = "@class:"
+CLASS_MEMBER_NB = "@class"
+CLASS_OWNER_NB = "@owner"
+SHARED_NB_PREFIX = "📚 "
+HIDDEN_MARK = "@hidden"
+
+def is_shared_row(row):
+    return str(row['User']).startswith(CLASS_PREFIX)
+
+def get_user_password(df, user):
+    user_rows = df[(df['User'] == user) & (df['Password'] != "")]
+    return user_rows.iloc[0]['Password'] if not user_rows.empty else ""
+
+def get_user_classes(df_all, user):
+    return df_all.loc[(df_all['User'] == user) & (df_all['Notebook'] == CLASS_MEMBER_NB), 'Word'].astype(str).tolist()
+
+def shared_nb_prefix(class_name):
+    return f"{SHARED_NB_PREFIX}{class_name} · "
+
+def is_class_notebook(df_all, user, notebook):
+    """是否為使用者目前所屬班級的共享本 (退出班級後留下的「📚 」本子不算，可以照常刪除)"""
+    return any(str(notebook).startswith(shared_nb_prefix(c)) for c in get_user_classes(df_all, user))
+
+def get_own_notebooks(df_all, user):
+    """使用者自己有單字的筆記本 (不含班級共享本、班級紀錄與隱藏標記)，派發只能從這些本子選"""
+    rows = df_all[(df_all['User'] == user) & (df_all['IPA'] != HIDDEN_MARK)]
+    nbs = rows['Notebook'].astype(str)
+    return sorted(nbs[~nbs.isin([CLASS_MEMBER_NB, CLASS_OWNER_NB]) & ~nbs.str.startswith(SHARED_NB_PREFIX)].unique())
+
+@profiled("resolve_user_view")
+def resolve_user_view(df_all, user):
+    """使用者看到的單字：自己的 + 公用 (User == "") + 所屬班級的共享本；同本同字時個人列優先。保留 df_all 的 index"""
+    own = df_all[(df_all['User'] == user) | (df_all['User'] == "") | (df_all['User'] == "nan")]
+    classes = get_user_classes(df_all, user)
+    view = own
+    if classes:
+        shared = df_all[df_all['User'].isin([CLASS_PREFIX + c for c in classes])]
+        own_keys = set(zip(own['Notebook'], own['Word'].astype(str).str.strip().str.lower()))
+        shared_keys = zip(shared['Notebook'], shared['Word'].astype(str).str.strip().str.lower())
+        shared = shared[[k not in own_keys for k in shared_keys]]
+        view = pd.concat([own, shared])
+    return view[(view['Notebook'] != CLASS_MEMBER_NB) & (view['Notebook'] != CLASS_OWNER_NB) & (view['IPA'] != HIDDEN_MARK)]
+
+def join_class(df_all, user, class_name):
+    """加入已存在的班級 (老師派發過筆記本才有管理者列)；班級不存在時丟出 LookupError"""
+    if class_name in get_user_classes(df_all, user): return df_all
+    if get_class_owner(df_all, class_name) is None: raise LookupError(f"找不到班級「{class_name}」，請確認名稱或請老師先派發筆記本")
+    entry = {'User': user, 'Password': get_user_password(df_all, user), 'Notebook': CLASS_MEMBER_NB, 'Word': class_name, 'IPA': '', 'Chinese': '', 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}
+    return pd.concat([df_all, pd.DataFrame([entry])], ignore_index=True)
+
+def leave_class(df_all, user, class_name):
+    """退出班級：連同自己在該班共享本裡的覆寫列、隱藏標記與新增的字一起移除，才不會留下一本刪不掉的「📚 」本子"""
+    mine = df_all['User'] == user
+    membership = mine & (df_all['Notebook'] == CLASS_MEMBER_NB) & (df_all['Word'] == class_name)
+    overlays = mine & df_all['Notebook'].astype(str).str.startswith(shared_nb_prefix(class_name))
+    return df_all[~(membership | overlays)]
+
+def get_class_owner(df_all, class_name):
+    owner_rows = df_all[(df_all['User'] == CLASS_PREFIX + class_name) & (df_all['Notebook'] == CLASS_OWNER_NB)]
+    return str(owner_rows.iloc[0]['Word']) if not owner_rows.empty else None
+
+@profiled("publish_notebook")
+def publish_notebook(df_all, user, notebook, class_name):
+    """把自己的筆記本派發給班級：只複製一份 (沿用已有的音標與翻譯)，重新派發會整本取代。
+    第一位派發的人成為班級管理者，其他人派發會丟出 PermissionError；本子沒有單字時丟出 ValueError"""
+    class_user = CLASS_PREFIX + class_name
+    owner = get_class_owner(df_all, class_name)
+    if owner is not None and owner != user: raise PermissionError(f"班級「{class_name}」由 {owner} 管理，只有管理者能派發筆記本")
+    shared_nb = f"{shared_nb_prefix(class_name)}{notebook}"
+    src = df_all[(df_all['User'] == user) & (df_all['Notebook'] == notebook) & (df_all['IPA'] != HIDDEN_MARK)]
+    src = src[~src['Word'].astype(str).str.strip().str.lower().duplicated()]
+    if src.empty: raise ValueError(f"「{notebook}」裡沒有你自己的單字，無法派發")
+    copies = src.assign(User=class_user, Password="", Notebook=shared_nb)
+    if owner is None:
+        copies = pd.concat([copies, pd.DataFrame([{'User': class_user, 'Password': "", 'Notebook': CLASS_OWNER_NB, 'Word': user, 'IPA': '', 'Chinese': '', 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}])])
+    df_all = df_all[~((df_all['User'] == class_user) & (df_all['Notebook'] == shared_nb))]
+    return pd.concat([df_all, copies], ignore_index=True), len(src)
+
+def edit_chinese_for_user(df_all, user, row, new_chi):
+    """修改中文：共享列不動，改寫一筆學生自己的覆寫列 (copy-on-write)"""
+    if not is_shared_row(row):
+        df_all.loc[df_all.index == row.name, 'Chinese'] = new_chi
+        return df_all
+    entry = {'User': user, 'Password': get_user_password(df_all, user), 'Notebook': row['Notebook'], 'Word': row['Word'], 'IPA': row['IPA'], 'Chinese': new_chi, 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}
+    return pd.concat([df_all, pd.DataFrame([entry])], ignore_index=True)
+
+def delete_word_for_user(df_all, user, row):
+    """刪除自己的列；若同本同字還有共享列，留一筆隱藏標記讓它不再出現，共享本本身不動"""
+    word_lower = str(row['Word']).strip().lower()
+    df_all = df_all[~((df_all['User'].astype(str) == user) & (df_all['Word'] == row['Word']) & (df_all['Notebook'] == row['Notebook']))]
+    shadowed = (df_all['User'].astype(str).str.startswith(CLASS_PREFIX) & (df_all['Notebook'] == row['Notebook'])
+                & (df_all['Word'].astype(str).str.strip().str.lower() == word_lower))
+    if shadowed.any():
+        entry = {'User': user, 'Password': get_user_password(df_all, user), 'Notebook': row['Notebook'], 'Word': row['Word'], 'IPA': HIDDEN_MARK, 'Chinese': '', 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}
+        df_all = pd.concat([df_all, pd.DataFrame([entry])], ignore_index=True)
+    return df_all
+
 def add_to_mistake_notebook(row, user):
     df = st.session_state.df
     mistake_nb_name = "🔥 錯題本 (Auto)"
@@ -224,8 +712,7 @@ def add_to_mistake_notebook(row, user):
         user_rows = df[df['User'] == user]
         user_pwd = user_rows.iloc[0]['Password'] if not user_rows.empty else ""
         new_entry = {'User': str(user).strip(), 'Password': user_pwd, 'Notebook': mistake_nb_name, 'Word': row['Word'], 'IPA': row['IPA'], 'Chinese': row['Chinese'], 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}
-        df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-        st.session_state.df = df; save_to_google_sheet(df)
+        append_rows(df, [new_entry])
         return True
     return False
 
@@ -236,7 +723,9 @@ def add_to_mistake_notebook(row, user):
 def initialize_session_state():
     if 'logged_in' not in st.session_state: st.session_state.logged_in = False
     if 'current_user' not in st.session_state: st.session_state.current_user = None
-    if 'df' not in st.session_state: st.session_state.df = get_google_sheet_data()
+    # 資料改在背景讀取，登入頁不必等待；真正用到時再由 ensure_df_loaded() 取回
+    if 'df' not in st.session_state and 'df_future' not in st.session_state:
+        st.session_state.df_future = get_loader_pool().submit(get_google_sheet_data)
     if 'play_order' not in st.session_state: st.session_state.play_order = ["英文", "中文", "英文"] 
     if 'accent_tld' not in st.session_state: st.session_state.accent_tld = 'com'
     if 'is_slow' not in st.session_state: st.session_state.is_slow = False
@@ -255,6 +744,10 @@ def initialize_session_state():
     if 'spell_correct' not in st.session_state: st.session_state.spell_correct = False
     if 'spell_score' not in st.session_state: st.session_state.spell_score = 0
     if 'spell_total' not in st.session_state: st.session_state.spell_total = 0
+    if 'spell_distance' not in st.session_state: st.session_state.spell_distance = 0
+    if 'spell_tolerant' not in st.session_state: st.session_state.spell_tolerant = False
+
+    if 'data_version' not in st.session_state: st.session_state.data_version = 0
     
     if 'msg_success' not in st.session_state: st.session_state.msg_success = ""
     if 'msg_warning' not in st.session_state: st.session_state.msg_warning = ""
@@ -264,6 +757,14 @@ def initialize_session_state():
     # 用於單字輸入的狀態
     if 'input_word' not in st.session_state: st.session_state.input_word = ""
 
+def ensure_df_loaded():
+    """等待背景載入完成並放入 st.session_state.df"""
+    if 'df' not in st.session_state:
+        with perf_timer("wait_df_load"), st.spinner("資料載入中..."):
+            st.session_state.df = st.session_state.df_future.result()
+        del st.session_state.df_future
+    return st.session_state.df
+
 # --- 核心邏輯：提交單字 ---
 def submit_single_word():
     """處理單字提交的邏輯"""
@@ -274,22 +775,22 @@ def submit_single_word():
     df = st.session_state.df
     
     if w_in and target_nb:
+        if str(target_nb).startswith(SHARED_NB_PREFIX) and not is_class_notebook(df, current_user, target_nb):
+            st.session_state.msg_warning = f"⚠️ 「{SHARED_NB_PREFIX.strip()}」開頭的名稱保留給班級共享筆記本"
         # 嚴格重複檢查
-        if check_duplicate(df, current_user, target_nb, w_in):
+        elif check_duplicate(df, current_user, target_nb, w_in):
             st.session_state.msg_warning = f"⚠️ 單字 '{w_in}' 已經存在！"
             # 注意：這裡不清空 input_word，讓使用者知道哪個字重複
         else:
             try:
                 user_rows = df[df['User'] == current_user]
                 user_pwd = user_rows.iloc[0]['Password'] if not user_rows.empty else ""
-                ipa = f"[{eng_to_ipa.convert(w_in)}]"
-                trans = GoogleTranslator(source='auto', target='zh-TW').translate(w_in)
+                ipa = to_ipa(w_in)
+                trans = translate_to_zh(w_in)
                 new = {'User': current_user, 'Password': user_pwd, 'Notebook': target_nb, 'Word': w_in, 'IPA': ipa, 'Chinese': trans, 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}
                 
-                # 更新 DataFrame
-                df_new = pd.concat([df, pd.DataFrame([new])], ignore_index=True)
-                st.session_state.df = df_new
-                save_to_google_sheet(df_new)
+                # 更新 DataFrame (同時增量更新搜尋索引)
+                append_rows(df, [new])
                 
                 st.session_state.msg_success = f"✅ 已儲存：{w_in}"
                 st.session_state.input_word = "" # 成功後清空
@@ -306,6 +807,9 @@ def add_words_callback():
         user_rows = df[df['User'] == current_user]
         if not user_rows.empty: user_pwd = user_rows.iloc[0]['Password']
     
+    if str(target_nb).startswith(SHARED_NB_PREFIX) and not is_class_notebook(df, current_user, target_nb):
+        st.session_state.msg_warning = f"⚠️ 「{SHARED_NB_PREFIX.strip()}」開頭的名稱保留給班級共享筆記本"; return
+
     words_to_add = [w.strip() for w in re.split(r'[,\n ]', final_text) if w.strip()]
     new_entries = []
     skipped = 0
@@ -314,13 +818,12 @@ def add_words_callback():
         if check_duplicate(df, current_user, target_nb, w): skipped += 1
         else:
             try:
-                ipa = f"[{eng_to_ipa.convert(w)}]"
-                trans = GoogleTranslator(source='auto', target='zh-TW').translate(w)
+                ipa = to_ipa(w)
+                trans = translate_to_zh(w)
                 new_entries.append({'User': current_user, 'Password': user_pwd, 'Notebook': target_nb, 'Word': w, 'IPA': ipa, 'Chinese': trans, 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')})
             except: pass
     if new_entries:
-        df_all = pd.concat([df, pd.DataFrame(new_entries)], ignore_index=True)
-        st.session_state.df = df_all; save_to_google_sheet(df_all)
+        append_rows(df, new_entries)
         st.session_state.msg_success = f"✅ 成功加入 {len(new_entries)} 筆單字！(已略過 {skipped} 筆重複)"
         st.session_state.ocr_editor = ""
     elif skipped > 0: st.session_state.msg_warning = f"⚠️ 所有 {skipped} 筆單字都重複了！"
@@ -369,7 +872,9 @@ def check_spelling():
         st.session_state.spell_total += 1
         correct = str(st.session_state.spell_current['Word']).strip().lower()
         user = str(st.session_state.spell_input).strip().lower()
-        if correct == user:
+        distance = edit_distance(user, correct)
+        st.session_state.spell_distance = distance
+        if distance == 0 or (st.session_state.spell_tolerant and distance <= spelling_tolerance(correct)):
             st.session_state.spell_score += 1; st.session_state.spell_correct = True
         else:
             st.session_state.spell_correct = False
@@ -383,7 +888,6 @@ def login_page():
     login_ph = st.empty()
     with login_ph.container():
         st.markdown("""<div class="login-container"><div class="welcome-text">歡迎來到</div><h1 class="login-title">🚀 AI 智能單字速記通 🎓</h1><p style="color: #666; font-size: 18px; margin-top: 20px;">請輸入您的帳號與密碼</p></div>""", unsafe_allow_html=True)
-        df = st.session_state.df
         
         with st.form("login_form"):
             col1, col2, col3 = st.columns([1, 2, 1])
@@ -393,7 +897,9 @@ def login_page():
                 submit_val = st.form_submit_button("🚀 登入 / 註冊", type="primary", use_container_width=True)
                 
                 if submit_val:
-                    if user_input and pwd_input:
+                    if user_input and user_input.strip().startswith(CLASS_PREFIX): st.error("此帳號名稱保留給班級使用")
+                    elif user_input and pwd_input:
+                        df = ensure_df_loaded()
                         user_data = df[df['User'] == user_input.strip()]
                         is_new_user = True
                         stored_password = ""
@@ -413,7 +919,7 @@ def login_page():
                             else:
                                 dummy_entry = {'User': user_input.strip(), 'Password': pwd_input, 'Notebook': '預設筆記本', 'Word': 'Welcome', 'IPA': '', 'Chinese': '歡迎使用', 'Date': pd.Timestamp.now().strftime('%Y-%m-%d')}
                                 df_new = pd.concat([df, pd.DataFrame([dummy_entry])], ignore_index=True)
-                                st.session_state.df = df_new; save_to_google_sheet(df_new)
+                                update_df(df_new)
                             login_ph.empty(); st.rerun()
                         else:
                             if pwd_input == stored_password:
@@ -436,11 +942,11 @@ def main_app():
         st.warning(st.session_state.msg_warning)
         st.session_state.msg_warning = ""
 
-    df_all = st.session_state.df
+    df_all = ensure_df_loaded()
     current_user = str(st.session_state.current_user).strip()
     if 'User' not in df_all.columns: df_all['User'] = ""
     else: df_all['User'] = df_all['User'].astype(str).str.strip()
-    df = df_all[(df_all['User'] == current_user) | (df_all['User'] == "") | (df_all['User'] == "nan")]
+    df = resolve_user_view(df_all, current_user)
 
     st.markdown(f"""<div class="title-container"><h1 class="main-title">🚀 AI 智能單字速記通 🎓</h1><div class="sub-title">歡迎回來，{current_user}！</div></div>""", unsafe_allow_html=True)
     
@@ -455,6 +961,15 @@ def main_app():
                     st.session_state.target_nb_key = st.session_state.get('target_nb_key', '預設筆記本')
                     add_words_callback(); st.rerun()
 
+    with st.expander("🔍 搜尋單字 (所有筆記本)", expanded=False):
+        search_q = st.text_input("輸入英文、中文或音標 (可打部分字、容許拼錯)", key="search_q")
+        if search_q:
+            hits = get_search_index(df, current_user).search(search_q)
+            if hits:
+                st.dataframe(pd.DataFrame([{'單字': r['Word'], '音標': r['IPA'], '中文': r['Chinese'], '筆記本': r['Notebook'], '比對': how, '拼字差距': d}
+                                           for _, r, how, d in hits]), hide_index=True, use_container_width=True)
+            else: st.info("找不到相符的單字")
+
     notebooks = df['Notebook'].unique().tolist()
     if "🔥 錯題本 (Auto)" not in notebooks: notebooks.append("🔥 錯題本 (Auto)")
     if 'filter_nb_key' not in st.session_state: st.session_state.filter_nb_key = '全部'
@@ -476,6 +991,7 @@ def main_app():
         if '預設筆記本' not in notebooks: notebooks.append('預設筆記本')
         nb_mode = st.radio("筆記本來源", ["選擇現有", "建立新本"], horizontal=True, label_visibility="collapsed")
         target_nb = st.selectbox("選擇筆記本", notebooks, key="target_nb_key") if nb_mode == "選擇現有" else st.text_input("輸入新筆記本名稱", "我的單字本", key="target_nb_key")
+        if nb_mode == "建立新本" and str(target_nb).startswith(SHARED_NB_PREFIX): st.warning(f"「{SHARED_NB_PREFIX.strip()}」開頭的名稱保留給班級共享筆記本，請換一個名稱")
         st.divider()
         ocr_opts = ["🔤 單字輸入", "🚀 批次貼上"]
         input_type = st.radio("輸入模式", ocr_opts, horizontal=True)
@@ -490,7 +1006,7 @@ def main_app():
                 if st.button("👀 翻譯", use_container_width=True):
                     val = st.session_state.input_word
                     if val and not is_contains_chinese(val):
-                        try: st.info(f"{GoogleTranslator(source='auto', target='zh-TW').translate(val)}")
+                        try: st.info(f"{translate_to_zh(val)}")
                         except: st.error("翻譯失敗")
             with c2:
                 # 試聽按鈕：只讀取，不加入
@@ -528,22 +1044,54 @@ def main_app():
                 if st.button("❌ 清空"): st.session_state.play_order = []
             st.info(f"順序：{' ➝ '.join(st.session_state.play_order) if st.session_state.play_order else '(未設定)'}")
 
+        with st.expander("🏫 班級共享筆記本", expanded=False):
+            my_classes = get_user_classes(df_all, current_user)
+            st.caption(f"已加入：{'、'.join(my_classes) if my_classes else '(尚未加入班級)'}")
+            class_in = st.text_input("班級名稱", placeholder="例如: 化工一甲", key="class_name_in").strip()
+            j1, j2 = st.columns(2)
+            with j1:
+                if st.button("➕ 加入班級", use_container_width=True) and class_in:
+                    try:
+                        df_all = join_class(df_all, current_user, class_in)
+                        update_df(df_all); st.success(f"已加入 {class_in}"); st.rerun()
+                    except LookupError as e: st.error(str(e))
+            with j2:
+                if st.button("🚪 退出班級", use_container_width=True) and class_in in my_classes:
+                    df_all = leave_class(df_all, current_user, class_in)
+                    update_df(df_all); st.success(f"已退出 {class_in}"); st.rerun()
+            st.write("📤 **派發筆記本給班級 (老師)**")
+            own_notebooks = get_own_notebooks(df_all, current_user)
+            pub_nb = st.selectbox("選擇要派發的筆記本", own_notebooks, key="pub_nb_sel")
+            if st.button("📤 派發", type="primary", use_container_width=True):
+                if not class_in: st.warning("請先輸入班級名稱")
+                elif not pub_nb: st.warning("還沒有自己的單字可以派發")
+                else:
+                    try:
+                        df_all, n = publish_notebook(df_all, current_user, pub_nb, class_in)
+                        update_df(df_all); st.success(f"已派發 {n} 個單字給 {class_in}"); st.rerun()
+                    except (PermissionError, ValueError) as e: st.error(str(e))
+
         with st.expander("🛠️ 進階管理 (含更名)", expanded=False):
-            if st.button("🔄 強制更新"): st.session_state.df = get_google_sheet_data(); st.success("已更新"); st.rerun()
+            if st.button("🔄 強制更新"):
+                st.session_state.df = get_google_sheet_data(); st.session_state.data_version += 1
+                st.success("已更新"); st.rerun()
+            if is_perf_admin(current_user): st.toggle("📊 顯示效能監測面板", key="perf_panel")
             st.write("✏️ **更名筆記本**")
             ren_target = st.selectbox("選擇對象", notebooks, key='ren_sel')
             ren_new = st.text_input("輸入新名稱", key='ren_val')
             if st.button("確認更名"):
-                if ren_new and ren_new != ren_target:
+                if is_class_notebook(df_all, current_user, ren_target) or ren_new.startswith(SHARED_NB_PREFIX): st.warning("共享筆記本由老師管理，不能更名")
+                elif ren_new and ren_new != ren_target:
                     df_all.loc[(df_all['User'].astype(str) == current_user) & (df_all['Notebook'] == ren_target), 'Notebook'] = ren_new
-                    st.session_state.df = df_all; save_to_google_sheet(df_all); st.success("已更名"); time.sleep(1); st.rerun()
+                    update_df(df_all); st.success("已更名"); time.sleep(1); st.rerun()
             st.write("🗑️ **刪除筆記本**")
             del_target = st.selectbox("選擇刪除對象", notebooks, key="del_sel")
             if st.button("刪除此本", type="primary"):
-                if st.session_state.get('confirm_del') != del_target: st.warning("再按一次確認"); st.session_state.confirm_del = del_target
+                if is_class_notebook(df_all, current_user, del_target): st.warning("共享筆記本由老師管理，不想看到請用「🏫 班級共享筆記本」退出班級")
+                elif st.session_state.get('confirm_del') != del_target: st.warning("再按一次確認"); st.session_state.confirm_del = del_target
                 else:
                     df_all = df_all[~((df_all['User'].astype(str) == current_user) & (df_all['Notebook'] == del_target))]
-                    st.session_state.df = df_all; save_to_google_sheet(df_all); st.success("已刪除"); st.rerun()
+                    update_df(df_all); st.success("已刪除"); st.rerun()
         st.markdown("---"); st.caption(f"版本: {VERSION}")
 
     st.divider()
@@ -577,6 +1125,7 @@ def main_app():
 
     mode = st.session_state.current_mode
 
+    perf_start(f"render_{mode}")
     if mode == 'list':
         c_sort, c_clean = st.columns([3, 1])
         with c_sort:
@@ -584,15 +1133,17 @@ def main_app():
         with c_clean:
             st.write(""); st.write("")
             if st.button("🗑️ 移除本子重複字", type="secondary", use_container_width=True):
-                current_nb_rows = df_all[(df_all['User'] == current_user) & (df_all['Notebook'] == current_nb)]
-                if not current_nb_rows.empty:
+                # 共享本的隱藏標記不是單字，不參與比對 (否則 keep='first' 可能留下標記、刪掉真正的字)
+                current_nb_rows = df_all[(df_all['User'] == current_user) & (df_all['Notebook'] == current_nb) & (df_all['IPA'] != HIDDEN_MARK)]
+                if str(current_nb).startswith(SHARED_NB_PREFIX) and current_nb_rows.empty: st.info("👍 共享筆記本由老師維護，您沒有自己加入的單字")
+                elif not current_nb_rows.empty:
                     temp_df = current_nb_rows.copy()
                     temp_df['word_lower'] = temp_df['Word'].astype(str).str.strip().str.lower()
                     dupes = temp_df.duplicated(subset=['word_lower'], keep='first')
                     indices_to_drop = temp_df[dupes].index
                     if not indices_to_drop.empty:
                         df_all = df_all.drop(indices_to_drop)
-                        st.session_state.df = df_all; save_to_google_sheet(df_all)
+                        update_df(df_all)
                         st.success(f"已移除 {len(indices_to_drop)} 個重複單字！")
                         time.sleep(1); st.rerun()
                     else: st.info("👍 此筆記本沒有重複單字")
@@ -620,8 +1171,8 @@ def main_app():
                 with c3:
                     if st.session_state.editing_idx == i:
                         if st.button("💾", key=f"save_{i}"):
-                            df_all.loc[df_all.index == row.name, 'Chinese'] = new_chi
-                            st.session_state.df = df_all; save_to_google_sheet(df_all)
+                            df_all = edit_chinese_for_user(df_all, current_user, row, new_chi)
+                            update_df(df_all)
                             st.session_state.editing_idx = None
                             st.rerun()
                     else:
@@ -640,8 +1191,8 @@ def main_app():
                 
                 with c6:
                     if st.button("🗑️", key=f"d{i}"):
-                        df_all = df_all[~((df_all['User'].astype(str) == current_user) & (df_all['Word'] == row['Word']) & (df_all['Notebook'] == row['Notebook']))]
-                        st.session_state.df = df_all; save_to_google_sheet(df_all); st.rerun()
+                        df_all = delete_word_for_user(df_all, current_user, row)
+                        update_df(df_all); st.rerun()
                 st.divider()
         else: st.info("目前無單字")
 
@@ -733,6 +1284,7 @@ def main_app():
 
     elif mode == 'spell':
         s_mode = st.radio("🎯 拼寫範圍", ["📖 當前筆記本", "🔥 錯題本"], horizontal=True, key="sm")
+        st.checkbox("🩹 容許小拼錯 (6 個字母以上的字差 1~2 個字母仍算對)", key="spell_tolerant")
         target_df = df[df['Notebook'] == "🔥 錯題本 (Auto)"] if s_mode == "🔥 錯題本" else filtered_df
         c_s, c_r = st.columns([3, 1])
         rate = (st.session_state.spell_score/st.session_state.spell_total)*100 if st.session_state.spell_total>0 else 0
@@ -759,16 +1311,28 @@ def main_app():
                 if st.button("✅ 送出", type="primary"):
                     st.session_state.spell_input = inp; check_spelling(); st.rerun()
             else:
-                if st.session_state.spell_correct: st.success(f"🎉 拼對了！ {sq['Word']}"); st.balloons()
-                else: st.error(f"❌ 拼錯了...\n\n您的輸入：**{st.session_state.spell_input}**\n\n正確答案：**{sq['Word']}**")
+                if st.session_state.spell_correct and st.session_state.spell_distance == 0: st.success(f"🎉 拼對了！ {sq['Word']}"); st.balloons()
+                elif st.session_state.spell_correct: st.success(f"👌 差一點！拼錯 {st.session_state.spell_distance} 個字母，仍算答對。\n\n您的輸入：**{st.session_state.spell_input}**\n\n正確答案：**{sq['Word']}**")
+                else: st.error(f"❌ 拼錯了... (差 {st.session_state.spell_distance} 個字母)\n\n您的輸入：**{st.session_state.spell_input}**\n\n正確答案：**{sq['Word']}**")
                 if st.button("➡️ 下一題", type="primary"): next_spelling(target_df); st.rerun()
 
 def main():
-    initialize_session_state()
-    if not st.session_state.logged_in:
-        login_page()
+    perf_begin_rerun()
+    try:
+        with perf_timer("rerun_total"):
+            initialize_session_state()
+            if not st.session_state.logged_in:
+                with perf_timer("login_page"): login_page()
+            else:
+                with perf_timer("main_app"): main_app()
+                perf_close_marks()
+        if st.session_state.logged_in and st.session_state.get('perf_panel') and is_perf_admin(st.session_state.current_user):
+            with st.sidebar: render_perf_panel()
+    except BaseException:
+        # st.rerun() / st.stop() 以例外中斷腳本
+        perf_end_rerun(interrupted=True); raise
     else:
-        main_app()
+        perf_end_rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,261 @@
+"""
+效能基準測試 (benchmark)：合成 vocab_db 資料 + 假的 gspread / GoogleTranslator / gTTS。
+
+用法：
+    python benchmark.py --sizes 1000 10000 100000 --users 100 --notebooks 5 -o bench.json
+    python benchmark.py --sizes 1000000 --latency-sheet 300 --latency-translate 80 --latency-tts 120
+    python benchmark.py --compare old.json new.json
+
+所有外部服務都在 library 層級被替換 (在 import app 之前)，因此直接呼叫的函式與
+Streamlit AppTest 執行的腳本都會用到同一組假服務，不會連到 Google。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+COLS = ['User', 'Password', 'Notebook', 'Word', 'IPA', 'Chinese', 'Date']
+FAKE_SECRETS = {"service_account": {"info": "{}"}}
+CHINESE_POOL = ["蘋果", "閥門", "幫浦", "螺絲", "溫度", "壓力", "反應器", "觸媒", "蒸餾", "冷凝器", "管線", "流量"]
+
+# ==========================================
+# 1. 合成資料
+# ==========================================
+
+def make_dataset(rows, users, notebooks, seed=0, shared_ratio=0.01):
+    """產生 rows 筆單字，平均分給 users 位使用者、每人 notebooks 本；shared_ratio 比例為共用單字 (User == "")"""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(string.ascii_lowercase))
+    lengths = rng.integers(3, 11, size=rows)
+    chars = letters[rng.integers(0, 26, size=(rows, 10))]
+    words = ["".join(chars[i, :lengths[i]]) for i in range(rows)]
+    user_ids = rng.integers(0, users, size=rows)
+    user_names = np.array([f"user{u:05d}" for u in range(users)])[user_ids]
+    user_names[rng.random(rows) < shared_ratio] = ""
+    nb_names = np.array([f"筆記本{n:02d}" for n in range(notebooks)])[rng.integers(0, notebooks, size=rows)]
+    chinese = np.array(CHINESE_POOL)[rng.integers(0, len(CHINESE_POOL), size=rows)]
+    df = pd.DataFrame({
+        'User': user_names,
+        'Password': np.where(user_names == "", "", "pw"),
+        'Notebook': nb_names,
+        'Word': words,
+        'IPA': [f"[{w}]" for w in words],
+        'Chinese': [f"{c}{i % 97}" for i, c in enumerate(chinese)],
+        'Date': "2025-01-01",
+    })
+    return df[COLS]
+
+# ==========================================
+# 2. 假服務 (可設定延遲，單位秒)
+# ==========================================
+
+class FakeLatency:
+    sheet = 0.0
+    translate = 0.0
+    tts = 0.0
+
+class FakeWorksheet:
+    def __init__(self, df):
+        self.records = df.to_dict('records')
+        self.updates = 0
+
+    def get_all_records(self):
+        time.sleep(FakeLatency.sheet)
+        return self.records
+
+    def clear(self):
+        time.sleep(FakeLatency.sheet)
+
+    def update(self, values, *args, **kwargs):
+        time.sleep(FakeLatency.sheet)
+        self.updates += 1
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet): self.sheet1 = worksheet
+
+class FakeClient:
+    worksheet = None
+
+    def open(self, name):
+        time.sleep(FakeLatency.sheet)
+        return FakeSpreadsheet(FakeClient.worksheet)
+
+class FakeCredentials:
+    @classmethod
+    def from_json_keyfile_dict(cls, keyfile_dict, scope=None):
+        return cls()
+
+class FakeTranslator:
+    def __init__(self, source='auto', target='zh-TW', **kwargs): self.target = target
+
+    def translate(self, text, **kwargs):
+        time.sleep(FakeLatency.translate)
+        return f"譯:{text}"
+
+class FakeTTS:
+    def __init__(self, text, lang='en', tld='com', slow=False, **kwargs): self.text = text
+
+    def write_to_fp(self, fp):
+        time.sleep(FakeLatency.tts)
+        fp.write(b"ID3" + self.text.encode("utf-8")[:1024])
+
+def patch_services(stack):
+    """在 library 層級替換外部服務；必須在 import app 之前呼叫"""
+    import gspread
+    import gtts
+    import deep_translator
+    import oauth2client.service_account as sa
+    stack.enter_context(mock.patch.object(gspread, "authorize", lambda creds: FakeClient()))
+    stack.enter_context(mock.patch.object(sa, "ServiceAccountCredentials", FakeCredentials))
+    stack.enter_context(mock.patch.object(deep_translator, "GoogleTranslator", FakeTranslator))
+    stack.enter_context(mock.patch.object(gtts, "gTTS", FakeTTS))
+
+# ==========================================
+# 3. 計時工具
+# ==========================================
+
+def measure(fn, repeat, setup=None):
+    """執行 repeat 次，回傳毫秒統計；setup 在每次計時前執行且不計入時間"""
+    samples = []
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }
+
+# ==========================================
+# 4. 測試項目
+# ==========================================
+
+def bench_size(app, st, rows, args):
+    df = make_dataset(rows, args.users, args.notebooks, seed=args.seed)
+    FakeClient.worksheet = FakeWorksheet(df)
+    app.get_sheet_pool.clear()  # 換資料集時丟掉共用連線，讓它重新開啟新的假工作表
+    user = "user00000"
+    user_df = df[(df['User'] == user) | (df['User'] == "")]
+    nb = user_df['Notebook'].iloc[0] if not user_df.empty else "筆記本00"
+    nb_df = user_df[user_df['Notebook'] == nb]
+    existing_word = nb_df['Word'].iloc[0] if not nb_df.empty else "apple"
+    results = {}
+
+    results['get_google_sheet_data (cold)'] = measure(app.get_google_sheet_data, args.repeat, setup=app.get_google_sheet_data.clear)
+    results['get_google_sheet_data (warm)'] = measure(app.get_google_sheet_data, args.repeat)
+    results['check_duplicate (hit)'] = measure(lambda: app.check_duplicate(df, user, nb, existing_word), args.repeat)
+    results['check_duplicate (miss)'] = measure(lambda: app.check_duplicate(df, user, nb, "zzzzzzzzzzzz"), args.repeat)
+
+    batch = " ".join([existing_word] + ["".join(random.choices(string.ascii_lowercase, k=8)) for _ in range(args.batch - 1)])
+    def reset_add_words():
+        st.session_state.df = df
+        st.session_state.current_user = user
+        st.session_state.target_nb_key = nb
+        st.session_state.ocr_editor = batch
+    results[f'add_words_callback ({args.batch} words)'] = measure(app.add_words_callback, args.repeat, setup=reset_add_words)
+
+    if not nb_df.empty:
+        results['next_question'] = measure(lambda: app.next_question(nb_df), args.repeat)
+        results[f'generate_custom_audio ({len(nb_df)} rows)'] = measure(lambda: app.generate_custom_audio(nb_df, ["英文", "中文", "英文"]), args.repeat)
+        results[f'to_excel ({len(nb_df)} rows)'] = measure(lambda: app.to_excel(nb_df), args.repeat)
+
+    key = f'list_mode_render ({len(nb_df)} rows)'
+    if len(nb_df) > args.render_limit: results[key] = {'skipped': f"> --render-limit {args.render_limit}"}
+    else: results[key] = bench_list_mode(df, user, nb, args)
+    return {'rows': rows, 'user_rows': len(user_df), 'notebook_rows': len(nb_df), 'results': results}
+
+def bench_list_mode(df, user, nb, args):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.secrets["service_account"] = FAKE_SECRETS["service_account"]
+    def setup():
+        at.session_state.df = df
+        at.session_state.logged_in = True
+        at.session_state.current_user = user
+        at.session_state.current_mode = 'list'
+        at.session_state.filter_nb_key = nb
+    setup(); at.run()  # 第一次執行含模組載入，不計入
+    stats = measure(at.run, args.repeat, setup=setup)
+    if at.exception: stats['exception'] = str(at.exception[0].value)
+    return stats
+
+# ==========================================
+# 5. 比較兩次結果
+# ==========================================
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f: old = json.load(f)
+    with open(new_path, encoding="utf-8") as f: new = json.load(f)
+    old_runs = {r['rows']: r['results'] for r in old['runs']}
+    for run in new['runs']:
+        base = old_runs.get(run['rows'])
+        if base is None: continue
+        print(f"== rows={run['rows']} ==")
+        for name, stats in run['results'].items():
+            before = base.get(name, {})
+            if 'median_ms' not in stats or 'median_ms' not in before: continue
+            delta = (stats['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0.0
+            print(f"  {name:<45} {before['median_ms']:>10.2f} ms -> {stats['median_ms']:>10.2f} ms  ({delta:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI 智能單字速記通 效能基準測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="資料筆數 (可多個，最大建議 1000000)")
+    parser.add_argument("--users", type=int, default=100, help="使用者人數")
+    parser.add_argument("--notebooks", type=int, default=5, help="每位使用者的筆記本數")
+    parser.add_argument("--repeat", type=int, default=5, help="每個項目重複次數")
+    parser.add_argument("--batch", type=int, default=20, help="add_words_callback 一次加入的單字數")
+    parser.add_argument("--render-limit", type=int, default=2000, help="列表模式超過此筆數就略過 AppTest 渲染")
+    parser.add_argument("--latency-sheet", type=float, default=0.0, help="假 gspread 每次呼叫延遲 (ms)")
+    parser.add_argument("--latency-translate", type=float, default=0.0, help="假翻譯每次呼叫延遲 (ms)")
+    parser.add_argument("--latency-tts", type=float, default=0.0, help="假 gTTS 每次呼叫延遲 (ms)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="JSON 結果輸出路徑 (預設印到 stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="比較兩份 JSON 結果的中位數")
+    args = parser.parse_args(argv)
+
+    if args.compare: compare(*args.compare); return
+
+    FakeLatency.sheet = args.latency_sheet / 1000
+    FakeLatency.translate = args.latency_translate / 1000
+    FakeLatency.tts = args.latency_tts / 1000
+    random.seed(args.seed); np.random.seed(args.seed)
+
+    with ExitStack() as stack:
+        patch_services(stack)
+        import streamlit as st
+        stack.enter_context(mock.patch.object(st, "secrets", FAKE_SECRETS))
+        sys.path.insert(0, os.path.dirname(APP_PATH))
+        import app
+        runs = [bench_size(app, st, rows, args) for rows in args.sizes]
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        },
+        'runs': runs,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: f.write(text)
+    else: print(text)
+
+if __name__ == "__main__":
+    main()